@@ -6,12 +6,23 @@ Now using OpenRouter API with DeepSeek model for chat.
 """
 
 from flask import Flask, render_template, request, jsonify
+from flask.json.provider import JSONProvider
 import csv
+import hashlib
+import heapq
 import os
 import requests
 from dotenv import load_dotenv
 import json
+import orjson
+import pickle
 import re
+from array import array
+from bisect import bisect_left
+from functools import lru_cache, wraps
+from itertools import repeat
+from operator import itemgetter
+import threading
 
 load_dotenv()
 
@@ -23,51 +34,317 @@ MODEL = "deepseek/deepseek-r1-0528:free"
 if not OPENROUTER_API_KEY:
     print("WARNING: OPENROUTER_API_KEY not found in .env file")
 
+# Shared HTTP session so chat calls reuse pooled TCP/TLS connections to OpenRouter
+_HTTP = requests.Session()
+
+# Markdown code fence markers (```json or ```) around an AI reply
+FENCE_PATTERN = re.compile(r'```(?:json)?')
+
+# How the chat asks for details the AI flagged as missing from a prediction query
+MISSING_FIELD_PROMPTS = {
+    'rank': "your JEE Main rank (or marks/percentile)",
+    'category': "your category (OPEN, OBC-NCL, SC, ST or EWS)"
+}
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        # orjson takes no decoder options; keep the stdlib for callers that pass any
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand the encoded bytes straight to the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
 app = Flask(__name__)
+# Large /predict result lists dominate response time with the stdlib encoder
+app.json = OrjsonProvider(app)
 
 # Data directory path - Works for both local and Vercel serverless
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'cutoff-data-2025')
 MARKS_DATA_FILE = os.path.join(BASE_DIR, 'marks-rank-percentile', 'marks-rank-percentile.csv')
-
-# Dictionary to store data for each round (list of dicts)
+# Pre-parsed cutoff data written by scripts/build_data_cache.py and committed
+# alongside the CSVs, so Vercel cold starts skip parsing them
+DATA_CACHE_FILE = os.path.join(DATA_DIR, '_preparsed.pkl')
+# Bump when the cached layout changes so older caches are ignored
+DATA_CACHE_VERSION = 5
+
+# Closing rank margins (above the user's rank) for probability labels
+SAFE_RANK_MARGIN = 1000
+MODERATE_RANK_MARGIN = 100
+
+# Number of distinct /predict queries whose results are kept in memory.
+# Broad queries can return thousands of rows, so keep this modest.
+PREDICTION_CACHE_SIZE = 128
+# Most rows a /predict response carries; single-category queries stay well below
+# this, and only very broad queries (every category at once) are cut short
+MAX_RESULTS = 2000
+# Number of distinct chat cutoff lookups whose context text is kept in memory
+CUTOFF_CACHE_SIZE = 512
+
+# Dictionary to store data for each round. Each round is a column table:
+# {field: list of values}, one parallel list per column, sorted ascending by
+# closing rank. Rank and id columns are packed arrays.
 data_frames = {}
 marks_data = None
+# Marks vs rank table as compact text for the chat prompt, built by load_data_files()
+MARKS_CONTEXT = ""
+# Typecode of the packed rank columns; JEE ranks stay well below 2**32
+RANK_TYPECODE = 'I'
+# Largest rank a packed rank column can hold
+MAX_STORED_RANK = 2 ** (8 * array(RANK_TYPECODE).itemsize) - 1
+# The best round of every seat combination in one column table sorted by
+# closing rank, for round=ALL
+all_rounds_table = {}
+# Per-table inverted indexes: {round or 'ALL': {field: {value: ascending row positions}}}
+row_indexes = {}
+
+# Set once load_data() has run; the lock keeps concurrent first requests from loading twice
+_DATA_LOADED = False
+_DATA_LOCK = threading.Lock()
+
+# CSV columns kept in memory
+CSV_FIELDS = ('Institute', 'Academic Program Name', 'Quota', 'Seat Type', 'Gender',
+              'Opening Rank', 'Closing Rank')
+# Low-cardinality text columns whose values are shared between records
+CATEGORICAL_FIELDS = ('Institute', 'Academic Program Name', 'Quota', 'Seat Type', 'Gender')
+# Columns with an inverted index for the predictor's equality filters
+INDEXED_FIELDS = ('Seat Type', 'Quota', 'Academic Program Name', 'Institute Type', 'Gender')
+
+# Filter options and landing page stats, computed once by load_data()
+UNIQUE_CATEGORIES = []
+UNIQUE_QUOTAS = []
+UNIQUE_PROGRAMS = []
+UNIQUE_GENDERS = []
+# {field: ((value, lowercased value), ...)} for the categorical fields, so
+# substring matching never lowercases stored values at request time
+LOWERED_VALUES = {}
+STATS_DICT = {}
+# Each stored text value mapped to itself, to swap request values for the stored objects
+SHARED_VALUES = {}
 
 
 def parse_rank(rank_str):
     """Parse rank string to numeric, handling 'P' suffix for PwD ranks."""
-    if rank_str is None:
+    if not rank_str:
         return None
-    rank_str = str(rank_str).strip().replace('P', '')
+    # Most ranks are plain digits, so try the direct conversion first
     try:
         return int(rank_str)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return int(str(rank_str).strip().rstrip('P'))
     except (ValueError, TypeError):
         return None
 
 
-def load_data():
-    """Load all 6 round CSV files into memory and marks data."""
-    global data_frames, marks_data
+def parse_rank_column(ranks):
+    """Parse a column of rank strings into a packed array, with 0 for unusable ranks."""
+    # Clean columns convert entirely in C; fall back to parse_rank() per value
+    # only when some rank is blank, malformed or out of range
+    try:
+        return array(RANK_TYPECODE, map(int, map(str.rstrip, ranks, repeat('P'))))
+    except (ValueError, OverflowError):
+        parsed = map(parse_rank, ranks)
+        return array(RANK_TYPECODE, [rank if rank is not None and 0 <= rank <= MAX_STORED_RANK else 0
+                                     for rank in parsed])
 
-    print(f"Loading data from: {DATA_DIR}")
-    print(f"BASE_DIR is: {BASE_DIR}")
-    
+
+def row_count(table):
+    """Get the number of rows in a column table."""
+    return len(table['Closing Rank Numeric'])
+
+
+def reorder_rows(table, order):
+    """Return a copy of a column table with its rows rearranged into the given order."""
+    reordered = {}
+    for field, column in table.items():
+        values = map(column.__getitem__, order)
+        reordered[field] = array(column.typecode, values) if isinstance(column, array) else list(values)
+    return reordered
+
+
+def round_csv_path(round_num):
+    """Get the path of a round's cutoff CSV."""
+    return os.path.join(DATA_DIR, f'josaa_cutoff_data_2025_round{round_num}.csv')
+
+
+def read_round_csv(round_num, shared_values):
+    """Parse one round CSV into a column table, or None if the file is missing."""
+    file_path = round_csv_path(round_num)
+    if not os.path.exists(file_path):
+        print(f"WARNING: File not found: {file_path}")
+        return None
+
+    table = {field: [] for field in CSV_FIELDS}
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        # Look the columns up by position once instead of building a dict per row
+        appenders = [(header.index(field), table[field].append) for field in CSV_FIELDS]
+        width = max(position for position, _ in appenders) + 1
+        for row in reader:
+            # Skip blank lines and pad short rows with empty values, as DictReader did
+            if not row:
+                continue
+            if len(row) < width:
+                row += [''] * (width - len(row))
+            for position, append in appenders:
+                append(row[position])
+
+    # Point repeated text values at one shared string object (across all rounds)
+    for field in CATEGORICAL_FIELDS:
+        column = table[field]
+        table[field] = list(map(shared_values.setdefault, column, column))
+
+    # Add numeric versions of ranks; 0 marks a rank that could not be parsed
+    table['Closing Rank Numeric'] = parse_rank_column(table['Closing Rank'])
+    table['Opening Rank Numeric'] = parse_rank_column(table['Opening Rank'])
+
+    # Classified once per row at load time; predict() only compares the stored value
+    table['Institute Type'] = list(map(get_institute_type, table['Institute']))
+    table['Round'] = array('B', [round_num]) * row_count(table)
+    # Row order in the CSV, for listings that follow the file rather than the ranks
+    table['File Position'] = array('I', range(row_count(table)))
+
+    # Keep rows ascending by closing rank so predict() can bisect on it.
+    # Sorting descending (stable) and then reversing puts ties in reverse file
+    # order, so walking the rows backwards yields file order again.
+    closing = table['Closing Rank Numeric']
+    order = sorted(range(len(closing)), key=closing.__getitem__, reverse=True)
+    order.reverse()
+    return reorder_rows(table, order)
+
+
+def read_all_rounds():
+    """Parse every available round CSV into a {round: column table} dict."""
+    rounds = {}
+    shared_values = {}
+    combo_ids = {}
+    for round_num in range(1, 7):
+        table = read_round_csv(round_num, shared_values)
+        if table is None:
+            continue
+        # Number each (institute, program, quota, seat type, gender) combination
+        # so the all-rounds table can pick each one's best row by int
+        combos = zip(*(table[field] for field in CATEGORICAL_FIELDS))
+        table['Combo ID'] = array('I', [combo_ids.setdefault(combo, len(combo_ids)) for combo in combos])
+        rounds[round_num] = table
+    return rounds
+
+
+def source_fingerprint():
+    """Hash the round CSVs so a cache built from other data can be detected."""
+    # Content hashes survive deploys that reset file modification times
+    fingerprint = []
     for round_num in range(1, 7):
-        file_path = os.path.join(DATA_DIR, f'josaa_cutoff_data_2025_round{round_num}.csv')
+        file_path = round_csv_path(round_num)
         if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                records = []
-                for row in reader:
-                    # Add numeric versions of ranks
-                    row['Closing Rank Numeric'] = parse_rank(row.get('Closing Rank'))
-                    row['Opening Rank Numeric'] = parse_rank(row.get('Opening Rank'))
-                    records.append(row)
-                data_frames[round_num] = records
-                print(f"Loaded Round {round_num}: {len(records)} records")
-        else:
-            print(f"WARNING: File not found: {file_path}")
+            with open(file_path, 'rb') as f:
+                fingerprint.append((round_num, hashlib.sha1(f.read()).hexdigest()))
+    return tuple(fingerprint)
+
+
+def build_tables(rounds):
+    """Derive the all-rounds table and the row indexes from the parsed rounds."""
+    # Concatenate the rounds from last to first and stable-sort them so that,
+    # walked backwards, ties come out in round order and then file order.
+    all_rounds = {}
+    ordered = [rounds[round_num] for round_num in sorted(rounds, reverse=True)]
+    if ordered:
+        combined = {}
+        for field in ordered[0]:
+            column = ordered[0][field][:]
+            for table in ordered[1:]:
+                column += table[field]
+            combined[field] = column
+        closing = combined['Closing Rank Numeric']
+        # Each round is already a sorted run, so Timsort just merges the six
+        # runs; this beats heapq.merge, which yields one row at a time
+        merged = reorder_rows(combined, sorted(range(len(closing)), key=closing.__getitem__))
+
+        # For "All Rounds", keep only the best round for each unique combination:
+        # its last row, with the highest closing rank (best chance). Every
+        # predictor filter is a property of the combination, so a query's
+        # matches are exactly the best rows that pass, and predict() needs no
+        # per-row dedup. Later positions overwrite earlier ones in the dict.
+        best_rows = dict(zip(merged['Combo ID'], range(len(closing))))
+        all_rounds = reorder_rows(merged, sorted(best_rows.values()))
+
+    indexes = {round_num: build_row_index(table) for round_num, table in rounds.items()}
+    if all_rounds:
+        indexes['ALL'] = build_row_index(all_rounds)
+    return {'rounds': rounds, 'all_rounds': all_rounds, 'row_indexes': indexes}
+
+
+def read_data_cache():
+    """Load the pre-parsed tables, or None if the cache is missing or stale."""
+    if not os.path.exists(DATA_CACHE_FILE):
+        return None
+    try:
+        with open(DATA_CACHE_FILE, 'rb') as f:
+            cached = pickle.load(f)
+    except Exception as e:
+        print(f"WARNING: Could not read data cache: {e}")
+        return None
+    if (not isinstance(cached, dict) or cached.get('version') != DATA_CACHE_VERSION
+            or cached.get('sources') != source_fingerprint()):
+        print("WARNING: Data cache is out of date; parsing the CSVs instead")
+        return None
+    return cached
+
+
+def build_data_cache():
+    """Parse all round CSVs and write them to DATA_CACHE_FILE for fast cold starts."""
+    tables = build_tables(read_all_rounds())
+    cached = dict(tables, version=DATA_CACHE_VERSION, sources=source_fingerprint())
+    with open(DATA_CACHE_FILE, 'wb') as f:
+        pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"Wrote {len(tables['rounds'])} rounds to {DATA_CACHE_FILE}")
+    return tables
+
+
+def build_row_index(table):
+    """Map each value of the indexed fields to the ascending positions of its rows."""
+    index = {}
+    for field in INDEXED_FIELDS:
+        positions = {}
+        for position, value in enumerate(table[field]):
+            positions.setdefault(value, []).append(position)
+        index[field] = {value: array('I', rows) for value, rows in positions.items()}
+    return index
+
+
+def load_data_files():
+    """Load all 6 rounds of cutoff data into memory and marks data."""
+    global data_frames, marks_data, MARKS_CONTEXT, all_rounds_table, row_indexes
+    global UNIQUE_CATEGORIES, UNIQUE_QUOTAS, UNIQUE_PROGRAMS, UNIQUE_GENDERS
+    global LOWERED_VALUES, STATS_DICT, SHARED_VALUES
+
+    print(f"Loading data from: {DATA_DIR}")
+    print(f"BASE_DIR is: {BASE_DIR}")
+
+    # Prefer the pre-parsed cache; it skips CSV parsing, sorting and indexing
+    tables = read_data_cache()
+    source = " (cached)" if tables else ""
+    if tables is None:
+        tables = build_tables(read_all_rounds())
+    data_frames = tables['rounds']
+    all_rounds_table = tables['all_rounds']
+    row_indexes = tables['row_indexes']
+    for round_num, table in data_frames.items():
+        print(f"Loaded Round {round_num}: {row_count(table)} records{source}")
 
     if os.path.exists(MARKS_DATA_FILE):
         with open(MARKS_DATA_FILE, 'r', encoding='utf-8') as f:
@@ -75,7 +352,54 @@ def load_data():
             marks_data = list(reader)
             print("Loaded Marks vs Rank data")
 
+        # Format the table once instead of on every chat message
+        MARKS_CONTEXT = "Marks | Percentile | Rank\n" + "\n".join(
+            f"{row.get('JEE Main 2025 Score')} | {row.get('JEE Main 2025 Percentile')} | {row.get('JEE Main 2025 Rank')}"
+            for row in marks_data if row.get('JEE Main 2025 Rank')
+        )
+
+    # The data is read-only from here on, so derive the metadata once
+    unique_values = collect_unique_values(CATEGORICAL_FIELDS + ('Institute Type',))
+    SHARED_VALUES = {value: value for values in unique_values.values() for value in values}
+    UNIQUE_CATEGORIES = unique_values['Seat Type']
+    UNIQUE_QUOTAS = unique_values['Quota']
+    UNIQUE_PROGRAMS = unique_values['Academic Program Name']
+    UNIQUE_GENDERS = unique_values['Gender']
+    LOWERED_VALUES = {field: tuple((value, value.lower()) for value in unique_values[field])
+                      for field in CATEGORICAL_FIELDS}
+    STATS_DICT = {
+        'total_records': sum(row_count(table) for table in data_frames.values()),
+        'unique_institutes': len(unique_values['Institute']),
+        'unique_programs': len(UNIQUE_PROGRAMS),
+        'rounds': len(data_frames)
+    }
+
 
+def load_data():
+    """Load the data on first use; later calls return immediately."""
+    global _DATA_LOADED
+    if _DATA_LOADED:
+        return
+    with _DATA_LOCK:
+        if _DATA_LOADED:
+            return
+        print("Loading JoSAA 2025 Cutoff Data...")
+        load_data_files()
+        _DATA_LOADED = True
+        print(f"Data loaded successfully! Total rounds available: {len(data_frames)}")
+
+
+def requires_data(view):
+    """Decorator for views that read the cutoff data, loading it on first use."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        load_data()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+# Institute names repeat across thousands of rows, so classify each name once
+@lru_cache(maxsize=None)
 def get_institute_type(institute_name):
     """Determine the institute type from its name."""
     name = institute_name.upper()
@@ -93,74 +417,192 @@ def get_institute_type(institute_name):
     return 'GFTI'
 
 
-def get_probability(user_rank, closing_rank):
-    """Calculate admission probability based on rank difference."""
-    if closing_rank is None:
-        return 'Unknown'
-    
-    difference = closing_rank - user_rank
-    
-    if difference >= 1000:
-        return 'Safe'
-    elif difference >= 100:
-        return 'Moderate'
-    else:
-        return 'Risky'
+def get_probability_thresholds(user_rank):
+    """Return the minimum closing ranks for 'Safe' and 'Moderate' admission chances."""
+    return user_rank + SAFE_RANK_MARGIN, user_rank + MODERATE_RANK_MARGIN
+
+
+def collect_unique_values(fields):
+    """Get the sorted unique non-empty values of each field across all rounds."""
+    # The all-rounds table holds every seat combination, so one scan of each
+    # column there covers every value in all rounds
+    unique_values = {}
+    for field in fields:
+        values = set(all_rounds_table.get(field, ()))
+        values.discard('')
+        unique_values[field] = sorted(values)
+    return unique_values
 
 
 def get_unique_categories():
     """Get unique seat types/categories from all data."""
-    all_categories = set()
-    for records in data_frames.values():
-        for row in records:
-            if row.get('Seat Type'):
-                all_categories.add(row['Seat Type'])
-    return sorted(list(all_categories))
+    return list(UNIQUE_CATEGORIES)
 
 
 def get_unique_quotas():
     """Get unique quotas from all data."""
-    all_quotas = set()
-    for records in data_frames.values():
-        for row in records:
-            if row.get('Quota'):
-                all_quotas.add(row['Quota'])
-    return sorted(list(all_quotas))
+    return list(UNIQUE_QUOTAS)
 
 
 def get_unique_programs():
     """Get unique program names from all data."""
-    all_programs = set()
-    for records in data_frames.values():
-        for row in records:
-            if row.get('Academic Program Name'):
-                all_programs.add(row['Academic Program Name'])
-    return sorted(list(all_programs))
+    return list(UNIQUE_PROGRAMS)
+
+
+def get_matching_values(field, search):
+    """Get the stored values of a field that contain a lowercase search term."""
+    return {value for value, lowered in LOWERED_VALUES.get(field, ()) if search in lowered}
+
+
+def get_matching_genders(gender):
+    """Get the gender values that contain the requested gender (case-insensitive)."""
+    return get_matching_values('Gender', gender.lower())
 
 
 def get_stats():
     """Get statistics for the landing page."""
-    total_records = sum(len(records) for records in data_frames.values())
-    unique_institutes = set()
-    unique_programs = set()
-    for records in data_frames.values():
-        for row in records:
-            if row.get('Institute'):
-                unique_institutes.add(row['Institute'])
-            if row.get('Academic Program Name'):
-                unique_programs.add(row['Academic Program Name'])
-    
-    return {
-        'total_records': total_records,
-        'unique_institutes': len(unique_institutes),
-        'unique_programs': len(unique_programs),
-        'rounds': len(data_frames)
-    }
+    return dict(STATS_DICT)
+
+
+# The data is read-only after load_data(), so results can be cached per query.
+# The returned dicts are shared between requests and must not be modified.
+@lru_cache(maxsize=PREDICTION_CACHE_SIZE)
+def get_predictions(round_num, institute_type, category, gender, quota, program, user_rank):
+    """Get (up to MAX_RESULTS matching seats, highest closing rank first; total match count)."""
+    # Pick the presorted table to scan: the combined table for all rounds
+    table = all_rounds_table if round_num == 'ALL' else data_frames[round_num]
+    closing = table['Closing Rank Numeric']
+
+    # Collect the active equality filters; 'ALL' means no filter on that field.
+    # Using the stored string objects lets the comparisons below match on identity.
+    wanted = {}
+    if category != 'ALL':
+        wanted['Seat Type'] = SHARED_VALUES.get(category, category)
+    if quota != 'ALL':
+        wanted['Quota'] = SHARED_VALUES.get(quota, quota)
+    if program != 'ALL':
+        wanted['Academic Program Name'] = SHARED_VALUES.get(program, program)
+    if institute_type != 'ALL':
+        wanted['Institute Type'] = SHARED_VALUES.get(institute_type, institute_type)
+
+    # Resolve the gender substring match against the few distinct values up
+    # front; a single match becomes a plain equality filter
+    gender_values = None
+    if gender != 'ALL':
+        matching_genders = get_matching_genders(gender)
+        if not matching_genders:
+            return (), 0
+        if len(matching_genders) == 1:
+            wanted['Gender'] = next(iter(matching_genders))
+        elif len(matching_genders) < len(UNIQUE_GENDERS):
+            gender_values = matching_genders
+
+    # Rows are sorted by closing rank, so every row from here on has
+    # closing rank >= user rank
+    start = bisect_left(closing, user_rank)
+
+    # The probability bands are therefore contiguous row ranges too, so label
+    # rows by position instead of reading and comparing each closing rank
+    safe_from, moderate_from = get_probability_thresholds(user_rank)
+    moderate_start = bisect_left(closing, moderate_from, start)
+    safe_start = bisect_left(closing, safe_from, moderate_start)
+    candidates = range(start, len(closing))
+
+    # Start from the shortest matching index list instead of scanning every
+    # row; its positions are ascending too, so bisect it to the same start
+    index = row_indexes.get(round_num, {})
+    filters = sorted(((len(index[field].get(value, ())), field, value) for field, value in wanted.items()),
+                     key=itemgetter(0))
+    if filters:
+        field, value = filters[0][1:]
+        positions = index[field].get(value, ())
+        candidates = positions[bisect_left(positions, start):]
+
+    # Apply each remaining filter as one tight pass over the shrinking row list,
+    # most selective (fewest matching rows) first so later passes see fewer rows
+    for _, field, value in filters[1:]:
+        column = table[field]
+        candidates = [i for i in candidates if column[i] == value]
+    if gender_values is not None:
+        column = table['Gender']
+        candidates = [i for i in candidates if column[i] in gender_values]
+
+    institutes = table['Institute']
+    programs = table['Academic Program Name']
+    quotas = table['Quota']
+    seat_types = table['Seat Type']
+    genders = table['Gender']
+    opening_ranks = table['Opening Rank']
+    closing_ranks = table['Closing Rank']
+    rounds = table['Round']
+
+    # Highest closing rank (best chance) first
+    rows = candidates[::-1]
+
+    # Build each response dict straight from the columns, with its probability
+    # indicator, for the rows that will actually be sent
+    results = [{
+        'institute': institutes[i],
+        'program': programs[i],
+        'quota': quotas[i],
+        'seat_type': seat_types[i],
+        'gender': genders[i],
+        'opening_rank': opening_ranks[i],
+        'closing_rank': closing_ranks[i],
+        'probability': ('Safe' if i >= safe_start
+                        else 'Moderate' if i >= moderate_start
+                        else 'Risky'),
+        'round': rounds[i]
+    } for i in rows[:MAX_RESULTS]]
+
+    return tuple(results), len(rows)
+
+
+# The data is read-only after load_data(), so repeated chat lookups can be cached
+@lru_cache(maxsize=CUTOFF_CACHE_SIZE)
+def get_cutoff_context(round_num, inst_search, prog_search, search_cat, rank):
+    """Format the top 10 cutoff rows matching lowercase search terms as chat context."""
+    table = data_frames.get(round_num)
+    if not table:
+        table = {field: [] for field in CSV_FIELDS + ('Closing Rank Numeric', 'File Position')}
+
+    matches = range(row_count(table))
+
+    if rank:
+        # Rows are sorted by closing rank, so skip straight to
+        # the rows with closing rank >= the given rank
+        matches = range(bisect_left(table['Closing Rank Numeric'], rank), len(matches))
+
+    # Resolve each substring search against the distinct values once,
+    # then keep the rows holding one of the matching values
+    searches = (('Institute', inst_search), ('Academic Program Name', prog_search), ('Seat Type', search_cat))
+    for field, search in searches:
+        if search:
+            matching_values = get_matching_values(field, search)
+            column = table[field]
+            matches = [i for i in matches if column[i] in matching_values]
+
+    # The rows are stored by closing rank (ties reversed) for predict(); list
+    # them as the CSV does instead: in file order, or with a rank, by closing
+    # rank with ties in file order
+    file_positions = table['File Position']
+    if rank:
+        closing = table['Closing Rank Numeric']
+        results = heapq.nsmallest(10, matches, key=lambda i: (closing[i], file_positions[i]))
+    else:
+        results = heapq.nsmallest(10, matches, key=file_positions.__getitem__)
+    if not results:
+        return "No matching cutoff data found."
+    return "Matches (Round 6):\n" + "\n".join([
+        f"- {table['Institute'][i]}, {table['Academic Program Name'][i]}, {table['Seat Type'][i]}, Closing Rank: {table['Closing Rank'][i]}" 
+        for i in results
+    ])
 
 
 # ==================== ROUTES ====================
 
 @app.route('/')
+@requires_data
 def index():
     """Landing page."""
     stats = get_stats()
@@ -168,6 +610,7 @@ def index():
 
 
 @app.route('/predictor')
+@requires_data
 def predictor():
     """College predictor tool page."""
     categories = get_unique_categories()
@@ -177,6 +620,7 @@ def predictor():
 
 
 @app.route('/about')
+@requires_data
 def about():
     """About page."""
     stats = get_stats()
@@ -221,6 +665,8 @@ def robots():
 
 # ==================== BLOG ROUTES ====================
 
+# institutes.json is static, so read and index it once
+@lru_cache(maxsize=1)
 def load_institutes():
     """Load institute data from JSON file."""
     institutes_file = os.path.join(BASE_DIR, 'data', 'institutes.json')
@@ -231,6 +677,24 @@ def load_institutes():
     return []
 
 
+@lru_cache(maxsize=1)
+def get_institutes_by_slug():
+    """Map each institute slug to its data (the first entry wins)."""
+    by_slug = {}
+    for inst in load_institutes():
+        by_slug.setdefault(inst['slug'], inst)
+    return by_slug
+
+
+@lru_cache(maxsize=1)
+def get_institutes_by_type():
+    """Group the institutes by type, in file order."""
+    by_type = {}
+    for inst in load_institutes():
+        by_type.setdefault(inst['type'], []).append(inst)
+    return by_type
+
+
 @app.route('/blog')
 def blog():
     """Blog listing page with all IIT and NIT guides."""
@@ -241,20 +705,13 @@ def blog():
 @app.route('/blog/<slug>')
 def blog_post(slug):
     """Individual blog post for each institute."""
-    institutes = load_institutes()
-    
-    # Find the institute by slug
-    institute = None
-    for inst in institutes:
-        if inst['slug'] == slug:
-            institute = inst
-            break
+    institute = get_institutes_by_slug().get(slug)
     
     if not institute:
         return render_template('404.html'), 404
     
     # Get related institutes (same type, different slug)
-    related = [i for i in institutes if i['type'] == institute['type'] and i['slug'] != slug][:3]
+    related = [i for i in get_institutes_by_type()[institute['type']] if i['slug'] != slug][:3]
     
     return render_template('blog_post.html', institute=institute, related_institutes=related)
 
@@ -300,6 +757,7 @@ def rank_predictor():
 
 
 @app.route('/predict', methods=['POST'])
+@requires_data
 def predict():
     """Handle prediction requests."""
     try:
@@ -315,98 +773,16 @@ def predict():
         if user_rank <= 0:
             return jsonify({'error': 'Please enter a valid rank greater than 0', 'results': []})
         
-        # Determine which rounds to process
-        if round_num == 'ALL':
-            rounds_to_process = list(data_frames.keys())
-        else:
-            round_num_int = int(round_num)
-            if round_num_int not in data_frames:
-                return jsonify({'error': f'Data for Round {round_num_int} not available', 'results': []})
-            rounds_to_process = [round_num_int]
-        
-        all_results = []
-        
-        for rnd in rounds_to_process:
-            records = data_frames[rnd]
-            
-            for row in records:
-                # Create a copy for this result
-                result_row = dict(row)
-                result_row['Round'] = rnd
-                
-                # Filter by category (seat type)
-                if category != 'ALL' and result_row.get('Seat Type') != category:
-                    continue
-                
-                # Filter by gender
-                if gender != 'ALL':
-                    row_gender = result_row.get('Gender', '')
-                    if gender.lower() not in row_gender.lower():
-                        continue
-                
-                # Filter by quota
-                if quota != 'ALL' and result_row.get('Quota') != quota:
-                    continue
-                
-                # Filter by program
-                if program != 'ALL' and result_row.get('Academic Program Name') != program:
-                    continue
-                
-                # Filter by institute type
-                if institute_type != 'ALL':
-                    row_inst_type = get_institute_type(result_row.get('Institute', ''))
-                    if row_inst_type != institute_type:
-                        continue
-                
-                # Filter where user rank <= closing rank
-                closing_rank_num = result_row.get('Closing Rank Numeric')
-                if closing_rank_num is None or closing_rank_num < user_rank:
-                    continue
-                
-                # Add probability indicator
-                result_row['Probability'] = get_probability(user_rank, closing_rank_num)
-                
-                all_results.append(result_row)
+        if round_num != 'ALL':
+            round_num = int(round_num)
+            if round_num not in data_frames:
+                return jsonify({'error': f'Data for Round {round_num} not available', 'results': []})
         
-        # If "All Rounds" selected, keep only the best round for each unique combination
-        if round_num == 'ALL':
-            # Sort by closing rank descending first
-            all_results.sort(key=lambda x: x.get('Closing Rank Numeric') or 0, reverse=True)
-            
-            # Keep only first occurrence of each unique combination
-            seen = set()
-            unique_results = []
-            for row in all_results:
-                key = (row.get('Institute'), row.get('Academic Program Name'), 
-                       row.get('Quota'), row.get('Seat Type'), row.get('Gender'))
-                if key not in seen:
-                    seen.add(key)
-                    unique_results.append(row)
-            all_results = unique_results
-        
-        # Sort by closing rank (highest first = best chance)
-        all_results.sort(key=lambda x: x.get('Closing Rank Numeric') or 0, reverse=True)
-        
-        # Prepare results
-        results = []
-        for row in all_results:
-            result = {
-                'institute': row.get('Institute'),
-                'program': row.get('Academic Program Name'),
-                'quota': row.get('Quota'),
-                'seat_type': row.get('Seat Type'),
-                'gender': row.get('Gender'),
-                'opening_rank': row.get('Opening Rank'),
-                'closing_rank': row.get('Closing Rank'),
-                'probability': row.get('Probability')
-            }
-            if 'Round' in row:
-                result['round'] = int(row['Round'])
-            results.append(result)
+        results, count = get_predictions(round_num, institute_type, category, gender, quota, program, user_rank)
         
         return jsonify({
             'results': results,
-            'count': len(results),
+            'count': count,
             'user_rank': user_rank
         })
         
@@ -418,6 +794,7 @@ def predict():
 
 
 @app.route('/api/categories')
+@requires_data
 def api_categories():
     """API endpoint to get all categories."""
     categories = get_unique_categories()
@@ -425,6 +802,7 @@ def api_categories():
 
 
 @app.route('/api/quotas')
+@requires_data
 def api_quotas():
     """API endpoint to get all quotas."""
     quotas = get_unique_quotas()
@@ -432,6 +810,7 @@ def api_quotas():
 
 
 @app.route('/api/programs')
+@requires_data
 def api_programs():
     """API endpoint to get all program names."""
     programs = get_unique_programs()
@@ -439,6 +818,7 @@ def api_programs():
 
 
 @app.route('/api/stats')
+@requires_data
 def api_stats():
     """API endpoint to get statistics."""
     stats = get_stats()
@@ -446,6 +826,7 @@ def api_stats():
 
 
 @app.route('/chat', methods=['POST'])
+@requires_data
 def chat():
     """Handle chat requests with OpenRouter AI (DeepSeek)."""
     if not OPENROUTER_API_KEY:
@@ -471,7 +852,7 @@ def chat():
             "messages": messages
         }
         try:
-            resp = requests.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60)
+            resp = _HTTP.post(OPENROUTER_URL, headers=headers, json=payload, timeout=60)
             resp.raise_for_status()
             result = resp.json()
             return result['choices'][0]['message']['content'].strip()
@@ -525,85 +906,80 @@ JSON Structure (only for Scenario 1):
         if not text_response:
             return jsonify({'response': "I encountered an error connecting to the AI service. Please try again."})
         
-        # Parse response for JSON intent
-        json_pattern = r'\{.*\}'
-        match = re.search(json_pattern, text_response, re.DOTALL)
+        # Parse response for JSON intent. The model usually answers data queries
+        # with bare (or fenced) JSON, which parses directly without a regex scan.
+        parsed_intent = None
+        candidate = text_response.removeprefix('```json').removeprefix('```').removesuffix('```').strip()
+        if candidate.startswith('{'):
+            try:
+                parsed_intent = orjson.loads(candidate)
+            except orjson.JSONDecodeError:
+                pass
         
-        if match:
-            json_str = match.group()
+        if parsed_intent is None:
+            # Fall back to the outermost {...} embedded in a prose reply,
+            # found with two plain string scans rather than a regex
+            start = text_response.find('{')
+            end = text_response.rfind('}')
+            if start == -1 or end < start:
+                return jsonify({'response': text_response})
             try:
-                parsed_intent = json.loads(json_str)
-            except json.JSONDecodeError:
-                return jsonify({'response': text_response.replace('```json', '').replace('```', '')})
-
-            intent = parsed_intent.get('intent')
-            entities = parsed_intent.get('entities', {})
-            context_data = ""
-
-            if intent == 'missing_info':
-                pass 
-                
-            elif intent == 'cutoff':
-                round_num = entities.get('round') if entities.get('round') else 6
-                if round_num not in data_frames:
-                    round_num = 6
-                records = data_frames.get(round_num, [])
-                
-                filtered = records[:]
-                
-                if entities.get('institute'):
-                    inst_search = entities['institute'].lower()
-                    filtered = [r for r in filtered if inst_search in r.get('Institute', '').lower()]
-                
-                if entities.get('program'):
-                    prog_search = entities['program'].lower()
-                    filtered = [r for r in filtered if prog_search in r.get('Academic Program Name', '').lower()]
-                
-                if entities.get('category'):
-                    cat_map = {'OPEN': 'OPEN', 'GEN': 'OPEN', 'OBC': 'OBC-NCL', 'SC': 'SC', 'ST': 'ST', 'EWS': 'EWS'}
-                    search_cat = cat_map.get(entities['category'].upper(), entities['category']).lower()
-                    filtered = [r for r in filtered if search_cat in r.get('Seat Type', '').lower()]
-                
-                if entities.get('rank'):
-                    rank = int(entities['rank'])
-                    filtered = [r for r in filtered if (r.get('Closing Rank Numeric') or 0) >= rank]
-                    filtered.sort(key=lambda x: x.get('Closing Rank Numeric') or 0)
-                
-                results = filtered[:10]
-                if not results:
-                    context_data = "No matching cutoff data found."
-                else:
-                    context_data = "Matches (Round 6):\n" + "\n".join([
-                        f"- {r.get('Institute')}, {r.get('Academic Program Name')}, {r.get('Seat Type')}, Closing Rank: {r.get('Closing Rank')}" 
-                        for r in results
-                    ])
-
-            elif intent == 'rank_predict':
-                if marks_data:
-                    context_data = "Reference Data:\n" + "\n".join([str(row) for row in marks_data[:20]])
-                else:
-                    context_data = "Rank data unavailable."
-
-            # Get final response with context
-            final_messages = [
-                {"role": "system", "content": "You are a helpful JoSAA counseling assistant. Answer the user's question based on the provided context. Be friendly and encouraging."},
-                {"role": "user", "content": f"User asked: \"{user_message}\"\n\nContext found:\n{context_data}\n\nTask: Answer the user naturally based on the context. If 'missing_info', ask for missing details politely."}
-            ]
-            final_resp = call_openrouter(final_messages)
-            return jsonify({'response': final_resp if final_resp else "I couldn't process that. Please try again."})
-            
-        else:
-            return jsonify({'response': text_response})
+                parsed_intent = orjson.loads(text_response[start:end + 1])
+            except orjson.JSONDecodeError:
+                # Strip any code fences in one pass; most replies have none
+                if '```' in text_response:
+                    text_response = FENCE_PATTERN.sub('', text_response)
+                return jsonify({'response': text_response})
+        
+        intent = parsed_intent.get('intent')
+        entities = parsed_intent.get('entities', {})
+        context_data = ""
+
+        if intent == 'missing_info':
+            # Nothing to look up, so ask for the details without a second AI call
+            missing_fields = parsed_intent.get('missing_fields')
+            # The model sometimes names a single field as a plain string
+            if isinstance(missing_fields, str):
+                missing_fields = [missing_fields] if missing_fields.strip() else []
+            if not missing_fields or not isinstance(missing_fields, list):
+                missing_fields = ['rank', 'category']
+            details = " and ".join(MISSING_FIELD_PROMPTS.get(str(field), str(field)) for field in missing_fields)
+            return jsonify({'response': f"I'd be happy to help! To check your chances, please share {details}."})
+
+        elif intent == 'cutoff':
+            round_num = entities.get('round') if entities.get('round') else 6
+            if round_num not in data_frames:
+                round_num = 6
+            rank = int(entities['rank']) if entities.get('rank') else None
+            inst_search = entities['institute'].lower() if entities.get('institute') else None
+            prog_search = entities['program'].lower() if entities.get('program') else None
+            search_cat = None
+            if entities.get('category'):
+                cat_map = {'OPEN': 'OPEN', 'GEN': 'OPEN', 'OBC': 'OBC-NCL', 'SC': 'SC', 'ST': 'ST', 'EWS': 'EWS'}
+                search_cat = cat_map.get(entities['category'].upper(), entities['category']).lower()
+            context_data = get_cutoff_context(round_num, inst_search, prog_search, search_cat, rank)
+
+        elif intent == 'rank_predict':
+            if MARKS_CONTEXT:
+                context_data = "Reference Data:\n" + MARKS_CONTEXT
+            else:
+                context_data = "Rank data unavailable."
+
+        # Get final response with context
+        final_messages = [
+            {"role": "system", "content": "You are a helpful JoSAA counseling assistant. Answer the user's question based on the provided context. Be friendly and encouraging."},
+            {"role": "user", "content": f"User asked: \"{user_message}\"\n\nContext found:\n{context_data}\n\nTask: Answer the user naturally based on the context. If 'missing_info', ask for missing details politely."}
+        ]
+        final_resp = call_openrouter(final_messages)
+        return jsonify({'response': final_resp if final_resp else "I couldn't process that. Please try again."})
 
     except Exception as e:
         print(f"Chat Error: {e}")
         return jsonify({'response': "I encountered an error. Please try again."})
 
 
-# Load data at module level (important for gunicorn/production)
-print("Loading JoSAA 2025 Cutoff Data...")
-load_data()
-print(f"Data loaded successfully! Total rounds available: {len(data_frames)}")
+# Data is loaded lazily by @requires_data views, so static pages (blog, privacy,
+# robots.txt, ...) never pay the loading cost on a cold start
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
@@ -0,0 +1,21 @@
+"""
+Build the pre-parsed cutoff data cache.
+Run this after updating the round CSVs or the cached layout, and commit the
+resulting cutoff-data-2025/_preparsed.pkl: Vercel has no build step here and
+deploys the committed file, while Render also rebuilds it in its build command.
+app.load_data() reads the binary cache instead of re-parsing the CSVs; a cache
+built from different CSVs or an older layout is ignored at startup.
+
+Usage: python scripts/build_data_cache.py
+"""
+
+import sys
+import os
+
+# Add the parent directory to the path so we can import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import build_data_cache
+
+if __name__ == '__main__':
+    build_data_cache()